@@ -1,8 +1,11 @@
 from django.contrib import admin
+from django.db import transaction
+from django.utils import timezone
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Restaurant, Table, Booking
+from .models import Restaurant, Table, Booking, Notification
+from .slot_snapshot import record_booking_transition
 
 @admin.register(Restaurant)
 class RestaurantAdmin(admin.ModelAdmin):
@@ -91,23 +94,69 @@ class BookingAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('restaurant', 'table')
     
+    # Every write below also logs BookingChange rows for the slot snapshot
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            before = Booking.objects.filter(pk=obj.pk).first() if change else None
+            super().save_model(request, obj, form, change)
+            record_booking_transition(before, obj)
+    
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            record_booking_transition(obj, None)
+            super().delete_model(request, obj)
+    
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for booking in queryset:
+                record_booking_transition(booking, None)
+            super().delete_queryset(request, queryset)
+    
+    def _set_status(self, queryset, status):
+        with transaction.atomic():
+            for booking in queryset.exclude(status=status):
+                before = Booking(
+                    table_id=booking.table_id, visit_date=booking.visit_date,
+                    visit_time=booking.visit_time, status=booking.status
+                )
+                booking.status = status
+                record_booking_transition(before, booking)
+            return queryset.update(status=status)
+    
     actions = ['mark_confirmed', 'mark_cancelled', 'mark_completed']
     
     def mark_confirmed(self, request, queryset):
-        updated = queryset.update(status='confirmed')
+        updated = self._set_status(queryset, 'confirmed')
         self.message_user(request, f'{updated} bookings marked as confirmed.')
     mark_confirmed.short_description = 'Mark selected bookings as confirmed'
     
     def mark_cancelled(self, request, queryset):
-        updated = queryset.update(status='cancelled')
+        updated = self._set_status(queryset, 'cancelled')
         self.message_user(request, f'{updated} bookings marked as cancelled.')
     mark_cancelled.short_description = 'Mark selected bookings as cancelled'
     
     def mark_completed(self, request, queryset):
-        updated = queryset.update(status='completed')
+        updated = self._set_status(queryset, 'completed')
         self.message_user(request, f'{updated} bookings marked as completed.')
     mark_completed.short_description = 'Mark selected bookings as completed'
 
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['recipient', 'kind', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['recipient', 'booking__guest_name', 'booking__restaurant__name']
+    readonly_fields = ['booking', 'created_at', 'sent_at', 'last_error']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('booking')
+    
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(status='pending', next_attempt_at=timezone.now())
+        self.message_user(request, f'{updated} notifications queued for retry.')
+    retry_now.short_description = 'Retry selected notifications now'
+
 # Customize admin site
 admin.site.site_header = "Restaurant Table Booking Administration"
 admin.site.site_title = "Booking Admin"
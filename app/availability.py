@@ -0,0 +1,65 @@
+from django.db.models import Count, F, IntegerField, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Table, Booking
+
+def _free_tables(visit_date, visit_time, guests):
+    """Active tables that seat the party, annotated with how many are free at the slot"""
+    booked = (
+        Booking.objects.filter(
+            table=OuterRef('pk'),
+            visit_date=visit_date,
+            visit_time=visit_time,
+            status='confirmed',
+        )
+        .order_by()
+        .values('table')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    return (
+        Table.objects.filter(restaurant__is_active=True, is_active=True, size__gte=guests)
+        .annotate(available=F('quantity') - Coalesce(
+            Subquery(booked, output_field=IntegerField()), Value(0)
+        ))
+        .filter(available__gt=0)
+    )
+
+def find_available_restaurants(visit_date, visit_time, guests, location=''):
+    """Ranked restaurants with a free table that seats the party, as a lazy queryset.
+
+    Ranking is done in SQL (best table fit, then most free tables, then name)
+    so a Paginator slice only fetches one page of restaurants.
+    """
+    tables = _free_tables(visit_date, visit_time, guests)
+    if location:
+        tables = tables.filter(restaurant__location__icontains=location)
+    return (
+        tables.values('restaurant_id', 'restaurant__name', 'restaurant__location')
+        .annotate(best_table_size=Min('size'), available_tables=Sum('available'))
+        .order_by('best_table_size', '-available_tables', 'restaurant__name', 'restaurant_id')
+    )
+
+def with_tables(restaurants, visit_date, visit_time, guests):
+    """Results for a page of find_available_restaurants() rows, with one query for their tables"""
+    restaurants = list(restaurants)
+    tables = {}
+    rows = (
+        _free_tables(visit_date, visit_time, guests)
+        .filter(restaurant_id__in=[r['restaurant_id'] for r in restaurants])
+        .order_by('restaurant_id', 'size')
+        .values_list('restaurant_id', 'id', 'size', 'available')
+    )
+    for restaurant_id, table_id, size, available in rows:
+        tables.setdefault(restaurant_id, []).append({'id': table_id, 'size': size, 'available': available})
+    return [
+        {
+            'id': r['restaurant_id'],
+            'name': r['restaurant__name'],
+            'location': r['restaurant__location'],
+            'best_table_size': r['best_table_size'],
+            'available_tables': r['available_tables'],
+            'tables': tables.get(r['restaurant_id'], []),
+        }
+        for r in restaurants
+    ]
@@ -0,0 +1,73 @@
+from django import forms
+from .models import Restaurant
+import datetime
+
+class BookingForm(forms.Form):
+    guest_name = forms.CharField(
+        max_length=100, 
+        label="Guest name",
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter your full name'})
+    )
+    guest_email = forms.EmailField(
+        label="Guest email",
+        widget=forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'Enter your email address'})
+    )
+    guest_phone = forms.CharField(
+        max_length=20, 
+        required=False,
+        label="Phone number (optional)",
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter your phone number'})
+    )
+    visit_date = forms.DateField(
+        widget=forms.DateInput(attrs={
+            'type': 'date', 
+            'class': 'form-control'
+        }),
+        label="Visit date"
+    )
+    visit_time = forms.TimeField(
+        widget=forms.TimeInput(attrs={
+            'type': 'time', 
+            'step': '900',
+            'class': 'form-control'
+        }),
+        label="Visit time"
+    )
+    number_of_guests = forms.IntegerField(
+        min_value=1, 
+        max_value=20,
+        label="Number of guests",
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'How many people?'})
+    )
+    restaurant = forms.ModelChoiceField(
+        queryset=Restaurant.objects.filter(is_active=True),
+        empty_label="-- Choose a Restaurant --",
+        label="Restaurant",
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    special_requests = forms.CharField(
+        required=False,
+        label="Special requests (optional)",
+        widget=forms.Textarea(attrs={
+            'class': 'form-control', 
+            'rows': 3, 
+            'placeholder': 'Any special dietary requirements or requests?'
+        })
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Each form gets its own copy of the fields, so today's date is set per request
+        self.fields['visit_date'].widget.attrs['min'] = datetime.date.today().isoformat()
+
+    def clean_visit_date(self):
+        date = self.cleaned_data.get('visit_date')
+        if date and date < datetime.date.today():
+            raise forms.ValidationError("Cannot book for past dates.")
+        return date
+
+    def clean_number_of_guests(self):
+        guests = self.cleaned_data.get('number_of_guests')
+        if guests and guests > 20:
+            raise forms.ValidationError("Maximum 20 guests per booking.")
+        return guests
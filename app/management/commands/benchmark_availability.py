@@ -0,0 +1,108 @@
+import datetime
+import statistics
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from app.availability import find_available_restaurants, with_tables
+from app.models import Restaurant, Table, Booking
+from app.slot_snapshot import SlotSnapshot
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = ("Benchmark the multi-restaurant availability search and the in-memory slot snapshot "
+            "against synthetic data (rolled back afterwards)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--restaurants", type=int, default=2000, help="Synthetic restaurants to create (default: 2000)")
+        parser.add_argument("--iterations", type=int, default=20, help="Timed searches per scenario (default: 20)")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options["restaurants"])
+                self.run_scenarios(options["iterations"])
+                self.run_snapshot(options["iterations"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        self.visit_date = datetime.date.today() + datetime.timedelta(days=1)
+        self.visit_time = datetime.time(19, 30)
+        restaurants = Restaurant.objects.bulk_create([
+            Restaurant(name=f"Benchmark {i:05d}", location=f"{i % 500} {'Main' if i % 10 == 0 else 'Oak'} Street")
+            for i in range(count)
+        ])
+        tables = Table.objects.bulk_create([
+            Table(restaurant=restaurant, size=size, quantity=3)
+            for restaurant in restaurants
+            for size in (2, 4, 6, 8)
+        ])
+        # Fill the 4-top of every other restaurant for the benchmark slot so the counts matter
+        Booking.objects.bulk_create([
+            Booking(
+                guest_name="Benchmark", guest_email="bench@example.com",
+                visit_date=self.visit_date, visit_time=self.visit_time,
+                number_of_guests=4, restaurant_id=table.restaurant_id, table=table,
+            )
+            for table in tables[1::8]
+            for _ in range(table.quantity)
+        ])
+        self.restaurant_ids = [restaurant.id for restaurant in restaurants]
+        self.stdout.write(f"Seeded {len(restaurants)} restaurants, {len(tables)} table types.")
+
+    def run_scenarios(self, iterations):
+        for label, location in (("all restaurants", ""), ("location 'Main Street'", "Main Street")):
+            timings = []
+            for _ in range(iterations):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    paginator = Paginator(find_available_restaurants(self.visit_date, self.visit_time, 4, location), 10)
+                    page = with_tables(paginator.get_page(1), self.visit_date, self.visit_time, 4)
+                    timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(
+                f"{label}: {paginator.count} matches, first page of {len(page)} in {len(queries)} queries, "
+                f"median {statistics.median(timings):.1f} ms, max {max(timings):.1f} ms"
+            )
+
+    def run_snapshot(self, iterations):
+        snapshot = SlotSnapshot()
+        tracemalloc.start()
+        start = time.perf_counter()
+        snapshot.load()
+        load_ms = (time.perf_counter() - start) * 1000
+        footprint = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        stats = snapshot.stats()
+        self.stdout.write(
+            f"slot snapshot: loaded {stats['restaurants']} restaurants in {load_ms:.1f} ms, "
+            f"{footprint / 1024:.0f} KiB total, {stats['counter_arrays']} counter arrays "
+            f"({stats['counter_bytes'] / 1024:.0f} KiB)"
+        )
+
+        sample = self.restaurant_ids[:iterations * 10]
+        for label, lookup in (("snapshot lookup", snapshot.check), ("SQL lookup", self.sql_check)):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for restaurant_id in sample:
+                    lookup(restaurant_id, self.visit_date, self.visit_time, 4)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{label}: {elapsed / len(sample) * 1e6:.1f} us per check, "
+                f"{len(queries)} queries for {len(sample)} checks"
+            )
+
+    def sql_check(self, restaurant_id, visit_date, visit_time, guests):
+        """The per-table queries check_availability runs without the snapshot"""
+        tables = Table.objects.filter(restaurant_id=restaurant_id, size__gte=guests, is_active=True)
+        return [
+            table.quantity - Booking.objects.filter(
+                table=table, visit_date=visit_date, visit_time=visit_time, status='confirmed'
+            ).count()
+            for table in tables
+        ]
@@ -0,0 +1,77 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Boots Django the way a worker does (setup + URLconf) and reports its own peak RSS
+BOOT_SCRIPT = """
+import sys
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+try:
+    import resource
+except ImportError:
+    print(-1)
+else:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(rss if sys.platform == 'darwin' else rss * 1024)
+"""
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| *(\S+)$")
+
+class Command(BaseCommand):
+    help = "Report cold start time, peak RSS and an -X importtime digest for one or more settings profiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--settings-module",
+            action="append",
+            dest="profiles",
+            help="Settings module to profile; repeat to compare (default: main.settings and main.settings_slim)",
+        )
+        parser.add_argument("--runs", type=int, default=5, help="Cold starts per profile (default: 5)")
+        parser.add_argument("--top", type=int, default=10, help="Packages to list in the digest (default: 10)")
+
+    def handle(self, *args, **options):
+        profiles = options["profiles"] or ["main.settings", "main.settings_slim"]
+        for profile in profiles:
+            timings, peaks = [], []
+            for _ in range(options["runs"]):
+                elapsed, rss, _ = self.boot(profile)
+                timings.append(elapsed)
+                peaks.append(rss)
+            _, _, imports = self.boot(profile, importtime=True)
+            self.report(profile, timings, statistics.median(peaks), imports, options["top"])
+
+    def boot(self, profile, importtime=False):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": profile}
+        command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", BOOT_SCRIPT]
+        start = time.perf_counter()
+        result = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True)
+        elapsed = time.perf_counter() - start
+        rss = int(result.stdout.split()[-1])
+        imports = [IMPORT_LINE.match(line) for line in result.stderr.splitlines()]
+        return elapsed, rss, [match.groups() for match in imports if match]
+
+    def report(self, profile, timings, rss, imports, top):
+        rss_text = "n/a" if rss < 0 else f"{rss / 1024 / 1024:.1f} MiB"
+        self.stdout.write(self.style.SUCCESS(
+            f"{profile}: median start {statistics.median(timings) * 1000:.0f} ms, "
+            f"peak RSS {rss_text}, {len(imports)} modules imported"
+        ))
+
+        # Self time summed per package, with django split into its subpackages
+        packages = {}
+        for self_us, _, name in imports:
+            parts = name.split(".")
+            depth = 3 if name.startswith("django.contrib.") else 2 if parts[0] == "django" else 1
+            package = ".".join(parts[:depth])
+            packages[package] = packages.get(package, 0) + int(self_us)
+        for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"  {self_us / 1000:7.1f} ms  {package}")
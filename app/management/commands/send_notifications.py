@@ -0,0 +1,51 @@
+import math
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from app.notifications import deliver_pending
+
+class Command(BaseCommand):
+    help = "Drain the booking notification outbox and send pending emails"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="Notifications claimed per batch (default: 50)")
+        parser.add_argument("--workers", type=int, default=4, help="Threads used to send a batch (default: 4)")
+        parser.add_argument("--max-attempts", type=int, default=5, help="Give up after this many failed sends (default: 5)")
+        parser.add_argument("--base-delay", type=int, default=30, help="Seconds before the first retry, doubled each time (default: 30)")
+        parser.add_argument("--lease-seconds", type=int, default=300, help="How long a claimed batch is reserved for this worker (default: 300)")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting once the outbox is drained")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds to sleep between polls with --loop (default: 5)")
+
+    def handle(self, *args, **options):
+        # A batch that outlives its lease can be re-claimed and sent twice by another worker
+        timeout = getattr(settings, "EMAIL_TIMEOUT", None)
+        worst_case = math.ceil(options["batch_size"] / options["workers"]) * timeout if timeout else None
+        if worst_case and options["lease_seconds"] <= worst_case:
+            raise CommandError(
+                f"--lease-seconds must exceed the worst-case batch send time of {worst_case:g}s "
+                f"(EMAIL_TIMEOUT x batch size / workers)"
+            )
+        totals = [0, 0, 0]
+        try:
+            while True:
+                counts = deliver_pending(
+                    batch_size=options["batch_size"],
+                    workers=options["workers"],
+                    max_attempts=options["max_attempts"],
+                    base_delay=options["base_delay"],
+                    lease_seconds=options["lease_seconds"],
+                )
+                totals = [total + count for total, count in zip(totals, counts)]
+                if any(counts):
+                    sent, retried, failed = counts
+                    self.stdout.write(f"Batch sent: {sent}, scheduled for retry: {retried}, failed: {failed}.")
+                elif not options["loop"]:
+                    break
+                else:
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted, stopping.")
+        sent, retried, failed = totals
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Notifications sent: {sent}, scheduled for retry: {retried}, failed: {failed}."
+        ))
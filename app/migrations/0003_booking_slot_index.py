@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_notification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['table', 'visit_date', 'visit_time'], name='app_booking_table_i_a917da_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_booking_slot_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('visit_date', models.DateField()),
+                ('visit_time', models.TimeField()),
+                ('delta', models.SmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_changes', to='app.table')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -58,6 +58,7 @@ class Booking(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['table', 'visit_date', 'visit_time'])]
 
     def __str__(self):
         return (f"{self.guest_name} at {self.restaurant.name} on {self.visit_date} {self.visit_time} "
@@ -73,3 +74,46 @@ class Booking(models.Model):
     def can_be_cancelled(self):
         """Check if booking can be cancelled (not in past and not already cancelled)"""
         return not self.is_past_booking and self.status == 'confirmed'
+
+class Notification(models.Model):
+    """Outbox row for a guest email, written in the same transaction as the booking change"""
+    KIND_CHOICES = [
+        ('confirmation', 'Confirmation'),
+        ('cancellation', 'Cancellation'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    recipient = models.EmailField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.recipient} ({self.status})"
+
+class BookingChange(models.Model):
+    """Append-only log of confirmed-booking changes per table slot, read by the slot snapshot"""
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name='booking_changes')
+    visit_date = models.DateField()
+    visit_time = models.TimeField()
+    delta = models.SmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.table} on {self.visit_date} {self.visit_time}: {self.delta:+d}"
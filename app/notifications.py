@@ -0,0 +1,104 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Notification
+
+SUBJECTS = {
+    'confirmation': "Your table at {restaurant} is confirmed",
+    'cancellation': "Your booking at {restaurant} has been cancelled",
+}
+
+def enqueue_notification(booking, kind):
+    """Queue a guest email; call inside the transaction that changes the booking"""
+    return Notification.objects.create(booking=booking, kind=kind, recipient=booking.guest_email)
+
+def retry_delay(attempts, base_seconds=30, max_seconds=3600):
+    """Exponential backoff after the given number of failed attempts"""
+    return datetime.timedelta(seconds=min(base_seconds * 2 ** (attempts - 1), max_seconds))
+
+def _send(notification):
+    """Render and send one notification. Runs in a worker thread, so no DB writes here."""
+    booking = notification.booking
+    subject = SUBJECTS[notification.kind].format(restaurant=booking.restaurant.name)
+    body = render_to_string(f'emails/booking_{notification.kind}.txt', {'booking': booking})
+    send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [notification.recipient])
+
+def _try_send(notification):
+    try:
+        _send(notification)
+    except Exception as exc:
+        return exc
+    return None
+
+def _due_ids(now, batch_size):
+    return list(
+        Notification.objects.filter(status='pending', next_attempt_at__lte=now)
+        .values_list('id', flat=True)[:batch_size]
+    )
+
+def claim_batch(batch_size, lease_seconds=300):
+    """Lease due notifications so concurrent workers skip them until the lease runs out.
+
+    The lease is taken with a conditional update rather than row locks (which
+    SQLite ignores), so when two workers read the same due rows only the first
+    update wins and each worker gets back only the rows it leased.
+
+    Returns the batch and the lease's expiry, which is also each row's new next_attempt_at.
+    """
+    now = timezone.now()
+    lease = now + datetime.timedelta(seconds=lease_seconds)
+    due = _due_ids(now, batch_size)
+    Notification.objects.filter(id__in=due, status='pending', next_attempt_at__lte=now).update(
+        next_attempt_at=lease
+    )
+    batch = list(
+        Notification.objects.filter(id__in=due, status='pending', next_attempt_at=lease)
+        .select_related('booking__restaurant')
+    )
+    return batch, lease
+
+def deliver_pending(batch_size=50, workers=4, max_attempts=5, base_delay=30, lease_seconds=300):
+    """Send one batch of due notifications through a thread pool.
+
+    Results are only written for rows this worker still holds the lease on; if
+    sending outlived the lease and another worker re-claimed a row, its result
+    wins. Keep lease_seconds above the batch's worst-case send time
+    (EMAIL_TIMEOUT per message, batch_size / workers messages per thread).
+
+    Returns a (sent, retried, failed) tuple of counts.
+    """
+    batch, lease = claim_batch(batch_size, lease_seconds)
+    if not batch:
+        return 0, 0, 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        errors = list(pool.map(_try_send, batch))
+
+    sent = retried = failed = 0
+    for notification, error in zip(batch, errors):
+        update = {'attempts': notification.attempts + 1}
+        if error is None:
+            update.update(status='sent', sent_at=timezone.now(), last_error='')
+        else:
+            update['last_error'] = f"{type(error).__name__}: {error}"
+            if update['attempts'] >= max_attempts:
+                update['status'] = 'failed'
+            else:
+                update['next_attempt_at'] = timezone.now() + retry_delay(update['attempts'], base_delay)
+        held = Notification.objects.filter(
+            id=notification.id, status='pending', next_attempt_at=lease
+        ).update(**update)
+        if not held:
+            continue
+        if error is None:
+            sent += 1
+        elif update.get('status') == 'failed':
+            failed += 1
+        else:
+            retried += 1
+    return sent, retried, failed
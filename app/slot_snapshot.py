@@ -0,0 +1,284 @@
+import datetime
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Table, Booking, BookingChange
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+def record_booking_change(booking, delta):
+    """Log a change to confirmed bookings; call inside the transaction that changes the booking"""
+    if booking.table_id is None:
+        return None
+    return BookingChange.objects.create(
+        table_id=booking.table_id,
+        visit_date=booking.visit_date,
+        visit_time=booking.visit_time,
+        delta=delta,
+    )
+
+def record_booking_transition(before, after):
+    """Log the capacity effect of a booking going from `before` to `after` (either may be None)"""
+    def confirmed_slot(booking):
+        if booking is None or booking.status != 'confirmed' or booking.table_id is None:
+            return None
+        return booking.table_id, booking.visit_date, booking.visit_time
+
+    old, new = confirmed_slot(before), confirmed_slot(after)
+    if old == new:
+        return
+    if old:
+        record_booking_change(before, -1)
+    if new:
+        record_booking_change(after, 1)
+
+def slot_index(visit_time):
+    """15-minute slot of a time of day, or None when it is not on a slot boundary"""
+    minutes = visit_time.hour * 60 + visit_time.minute
+    if minutes % SLOT_MINUTES or visit_time.second or visit_time.microsecond:
+        return None
+    return minutes // SLOT_MINUTES
+
+class _Counters:
+    """One generation of the snapshot; replaced wholesale on every full load"""
+
+    def __init__(self, start_date, days, table_rows):
+        self.start_date = start_date
+        self.days = days
+        self.tables = {}
+        self.table_keys = {}
+        self.counts = {}
+        for table_id, restaurant_id, size, quantity in table_rows:
+            self.tables.setdefault(restaurant_id, []).append((size, table_id, quantity))
+            self.table_keys[table_id] = (restaurant_id, size)
+
+    def add(self, table_id, visit_date, visit_time, delta):
+        key = self.table_keys.get(table_id)
+        day = (visit_date - self.start_date).days
+        slot = slot_index(visit_time)
+        if key is None or slot is None or not 0 <= day < self.days:
+            return
+        counts = self.counts.get((*key, day))
+        if counts is None:
+            counts = self.counts[(*key, day)] = array('H', bytes(2 * SLOTS_PER_DAY))
+        counts[slot] = max(0, counts[slot] + delta)
+
+class SlotSnapshot:
+    """Read-only, per-process copy of table capacity and confirmed booking counts.
+
+    Counts live in one array('H') per restaurant/table size/day, indexed by
+    15-minute slot, for the next `days` days. The snapshot catches up from the
+    BookingChange log and is rebuilt from scratch every `reload_interval`
+    seconds or when the day rolls over, which also picks up table edits.
+    Rebuilds after the first one run on a background thread so requests keep
+    answering from the current counters meanwhile.
+
+    Each load deletes BookingChange rows older than `log_retention` seconds.
+    A snapshot that has not refreshed within that window may have missed
+    pruned rows, so it reloads synchronously instead of catching up.
+    Booking writes never go through it; the database stays authoritative.
+    """
+
+    def __init__(self, days=14, refresh_interval=1.0, reload_interval=300.0, gap_grace=10.0,
+                 log_retention=3600.0):
+        self.days = days
+        self.refresh_interval = refresh_interval
+        self.reload_interval = reload_interval
+        self.gap_grace = gap_grace
+        # Every live snapshot reloads well within this, so older rows are never read again
+        self.log_retention = max(log_retention, 2 * (reload_interval + gap_grace))
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._reload_thread = None
+        self._counters = None
+        self._low_water = 0
+        self._applied = set()
+        self._gap = None
+        self._loaded_at = 0.0
+        self._refreshed_at = 0.0
+
+    def load(self, attempts=3):
+        """Rebuild everything from the database.
+
+        The new counters are built without holding the lock, so refresh() and
+        lookups carry on against the current ones until they are swapped in.
+        """
+        for _ in range(attempts):
+            start = timezone.localdate()
+            cutoff = timezone.now() - datetime.timedelta(seconds=self.gap_grace)
+            with transaction.atomic():
+                low_water, applied = self._read_log(cutoff)
+                table_rows = (
+                    Table.objects.filter(is_active=True, restaurant__is_active=True)
+                    .order_by('restaurant_id', 'size')
+                    .values_list('id', 'restaurant_id', 'size', 'quantity')
+                )
+                counters = _Counters(start, self.days, table_rows)
+                count_rows = (
+                    Booking.objects.filter(
+                        status='confirmed',
+                        table__is_active=True,
+                        table__restaurant__is_active=True,
+                        visit_date__gte=start,
+                        visit_date__lt=start + datetime.timedelta(days=self.days),
+                    )
+                    .values_list('table_id', 'visit_date', 'visit_time')
+                    .annotate(booked=Count('id'))
+                    .order_by()
+                )
+                for table_id, visit_date, visit_time, booked in count_rows:
+                    counters.add(table_id, visit_date, visit_time, booked)
+                settled = self._read_log(cutoff, low_water)[1] == applied
+            if settled:
+                break
+
+        with self._lock:
+            self._counters = counters
+            self._low_water, self._applied, self._gap = low_water, applied, None
+            self._loaded_at = self._refreshed_at = time.monotonic()
+            if not settled:
+                # The log kept moving during every attempt; reload on the next refresh
+                self._loaded_at = 0.0
+            self._advance_low_water(self._refreshed_at)
+        self.prune_log()
+
+    def prune_log(self):
+        """Delete BookingChange rows older than log_retention"""
+        cutoff = timezone.now() - datetime.timedelta(seconds=self.log_retention)
+        last_expired = (
+            BookingChange.objects.filter(created_at__lt=cutoff)
+            .order_by('-id').values_list('id', flat=True).first()
+        )
+        if last_expired is not None:
+            BookingChange.objects.filter(id__lte=last_expired).delete()
+
+    def _reload_in_background(self):
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        self._reload_thread = threading.Thread(target=self._background_load, daemon=True)
+        self._reload_thread.start()
+
+    def _background_load(self):
+        try:
+            self.load()
+        finally:
+            connection.close()
+            self._reload_lock.release()
+
+    def _read_log(self, cutoff, low_water=None):
+        """The low-water mark and the ids above it that are visible right now.
+
+        The counts only reflect changes that were committed when they were read.
+        Under READ COMMITTED each query sees its own snapshot, so load() reads
+        the log before and after the counts and retries if it moved; otherwise
+        a change committed in between would be lost or applied twice. Ids from
+        the last gap_grace seconds stay above the low-water mark, so one that
+        was still uncommitted during the load is applied by a later refresh.
+        """
+        if low_water is None:
+            low_water = (
+                BookingChange.objects.filter(created_at__lt=cutoff)
+                .order_by('-id').values_list('id', flat=True).first()
+            ) or 0
+        return low_water, set(BookingChange.objects.filter(id__gt=low_water).values_list('id', flat=True))
+
+    def refresh(self):
+        """Apply BookingChange rows written since the last load or refresh"""
+        with self._lock:
+            changes = BookingChange.objects.filter(id__gt=self._low_water).values_list(
+                'id', 'table_id', 'visit_date', 'visit_time', 'delta'
+            )
+            for change_id, table_id, visit_date, visit_time, delta in changes:
+                if change_id not in self._applied:
+                    self._counters.add(table_id, visit_date, visit_time, delta)
+                    self._applied.add(change_id)
+            self._refreshed_at = time.monotonic()
+            self._advance_low_water(self._refreshed_at)
+
+    def _advance_low_water(self, now):
+        # Ids can commit out of order, so only move past a missing id once it
+        # has stayed missing for gap_grace seconds (a rolled back transaction).
+        while self._low_water + 1 in self._applied:
+            self._low_water += 1
+            self._applied.remove(self._low_water)
+        if not self._applied:
+            self._gap = None
+        elif self._gap is None or self._gap[0] != self._low_water:
+            self._gap = (self._low_water, now)
+        elif now - self._gap[1] >= self.gap_grace:
+            self._low_water = min(self._applied) - 1
+            self._gap = None
+            self._advance_low_water(now)
+
+    def maybe_refresh(self):
+        """Load or catch up if the snapshot is older than refresh_interval"""
+        now = time.monotonic()
+        if self._counters is not None and now - self._refreshed_at < self.refresh_interval:
+            return
+        if (self._counters is None
+                or now - self._refreshed_at + self.gap_grace >= self.log_retention):
+            self.load()
+            return
+        if (self._counters.start_date != timezone.localdate()
+                or now - self._loaded_at >= self.reload_interval):
+            # Day offsets are relative to the counters' own start date, so the
+            # current counters stay correct while the rebuild runs
+            self._reload_in_background()
+        self.refresh()
+
+    def check(self, restaurant_id, visit_date, visit_time, guests):
+        """Free tables in check_availability's format, or None when the snapshot cannot answer"""
+        self.maybe_refresh()
+        counters = self._counters
+        tables = counters.tables.get(restaurant_id)
+        day = (visit_date - counters.start_date).days
+        slot = slot_index(visit_time)
+        if tables is None or slot is None or not 0 <= day < self.days:
+            return None
+
+        available_tables = []
+        for size, table_id, quantity in tables:
+            if size < guests:
+                continue
+            counts = counters.counts.get((restaurant_id, size, day))
+            booked = counts[slot] if counts is not None else 0
+            if booked < quantity:
+                available_tables.append({'id': table_id, 'size': size, 'available': quantity - booked})
+        return available_tables
+
+    def stats(self):
+        """Sizes of the in-memory structures"""
+        counters = self._counters
+        if counters is None:
+            return {'restaurants': 0, 'tables': 0, 'counter_arrays': 0, 'counter_bytes': 0}
+        return {
+            'restaurants': len(counters.tables),
+            'tables': len(counters.table_keys),
+            'counter_arrays': len(counters.counts),
+            'counter_bytes': sum(counts.buffer_info()[1] * counts.itemsize for counts in counters.counts.values()),
+        }
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def get_slot_snapshot():
+    """This worker's snapshot, or None when settings.AVAILABILITY_SNAPSHOT is off"""
+    global _snapshot
+    if not getattr(settings, 'AVAILABILITY_SNAPSHOT', False):
+        return None
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = SlotSnapshot(
+                    days=getattr(settings, 'AVAILABILITY_SNAPSHOT_DAYS', 14),
+                    refresh_interval=getattr(settings, 'AVAILABILITY_SNAPSHOT_REFRESH_SECONDS', 1.0),
+                    log_retention=getattr(settings, 'AVAILABILITY_SNAPSHOT_LOG_RETENTION_SECONDS', 3600.0),
+                )
+    return _snapshot
@@ -1,10 +1,26 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.urls import reverse, NoReverseMatch
-from .models import Restaurant, Table, Booking
-from datetime import date, time
-from django.core.management import call_command
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.utils import timezone
+from django.contrib import admin
+from .admin import BookingAdmin
+from .models import Restaurant, Table, Booking, Notification, BookingChange
+from .forms import BookingForm
+from . import notifications
+from .notifications import deliver_pending
+from .availability import find_available_restaurants
+from . import slot_snapshot
+from .slot_snapshot import SlotSnapshot, record_booking_change
+from datetime import date, time, timedelta
+from django.core.management import call_command, CommandError
 from io import StringIO
 import os
+from unittest import mock
+import threading
+import time as time_module
 
 class RestaurantTableBookingTestCase(TestCase):
     def setUp(self):
@@ -101,3 +117,383 @@ TestPlace,Zone A,2,3
         self.assertTrue(Table.objects.filter(restaurant=restaurant, size=2, quantity=3).exists())
 
         os.remove(path)
+
+SLOW_SEND_SECONDS = 0.5
+
+class SlowEmailBackend(LocmemEmailBackend):
+    """Locmem backend that simulates a slow SMTP server"""
+    def send_messages(self, messages):
+        time_module.sleep(SLOW_SEND_SECONDS)
+        return super().send_messages(messages)
+
+class BrokenEmailBackend(LocmemEmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("SMTP unavailable")
+
+class NotificationOutboxTestCase(TestCase):
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(name="Outbox Bistro", location="Main Street")
+        self.table = Table.objects.create(restaurant=self.restaurant, size=4, quantity=5)
+        self.post_data = {
+            'guest_name': 'Dana',
+            'guest_email': 'dana@example.com',
+            'visit_date': (date.today() + timedelta(days=1)).isoformat(),
+            'visit_time': '19:30',
+            'number_of_guests': 2,
+            'restaurant': self.restaurant.id,
+        }
+
+    @override_settings(EMAIL_BACKEND='app.tests.SlowEmailBackend')
+    def test_booking_post_latency_is_independent_of_mail_backend(self):
+        start = time_module.perf_counter()
+        response = self.client.post(reverse('app:index'), data=self.post_data)
+        elapsed = time_module.perf_counter() - start
+
+        self.assertTemplateUsed(response, 'success.html')
+        self.assertLess(elapsed, SLOW_SEND_SECONDS)
+        self.assertEqual(len(mail.outbox), 0)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.kind, 'confirmation')
+        self.assertEqual(notification.status, 'pending')
+
+        self.assertEqual(deliver_pending(), (1, 0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['dana@example.com'])
+        self.assertIn(str(Booking.objects.get().id), mail.outbox[0].body)
+
+    def test_cancellation_enqueues_notification(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        booking = Booking.objects.get()
+        response = self.client.post(reverse('app:cancel_booking', args=[booking.id]))
+        self.assertRedirects(response, reverse('app:index'))
+        self.assertEqual(
+            list(Notification.objects.order_by('created_at').values_list('kind', flat=True)),
+            ['confirmation', 'cancellation'],
+        )
+
+    def test_double_submitted_cancellation_only_takes_effect_once(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        stale = [Booking.objects.get(), Booking.objects.get()]
+        url = reverse('app:cancel_booking', args=[stale[0].id])
+        # Both requests read the booking while it was still confirmed
+        with mock.patch('app.views.get_object_or_404', side_effect=stale):
+            self.client.post(url)
+            self.client.post(url)
+        self.assertEqual(Booking.objects.get().status, 'cancelled')
+        self.assertEqual(Notification.objects.filter(kind='cancellation').count(), 1)
+        self.assertEqual(BookingChange.objects.filter(delta=-1).count(), 1)
+
+    @override_settings(EMAIL_BACKEND='app.tests.BrokenEmailBackend')
+    def test_failed_sends_back_off_then_give_up(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        notification = Notification.objects.get()
+
+        self.assertEqual(deliver_pending(max_attempts=2), (0, 1, 0))
+        notification.refresh_from_db()
+        self.assertEqual(notification.attempts, 1)
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+        self.assertIn("SMTP unavailable", notification.last_error)
+
+        # Not due yet, so nothing is picked up
+        self.assertEqual(deliver_pending(max_attempts=2), (0, 0, 0))
+
+        Notification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_pending(max_attempts=2), (0, 0, 1))
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'failed')
+
+    def test_result_not_written_after_lease_is_lost(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        claim_batch = notifications.claim_batch
+
+        def claim_then_lose_lease(batch_size, lease_seconds):
+            claimed = claim_batch(batch_size, lease_seconds)
+            # Another worker re-claims the rows after this worker's lease expires
+            Notification.objects.update(next_attempt_at=timezone.now() + timedelta(minutes=5))
+            return claimed
+
+        with mock.patch('app.notifications.claim_batch', claim_then_lose_lease):
+            self.assertEqual(deliver_pending(), (0, 0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, 'pending')
+        self.assertEqual(notification.attempts, 0)
+
+    def test_workers_reading_the_same_due_rows_lease_them_once(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        due = list(Notification.objects.values_list('id', flat=True))
+        first, _ = notifications.claim_batch(10)
+        # A second worker read the same due ids before the first one leased them
+        with mock.patch('app.notifications._due_ids', return_value=due):
+            second, _ = notifications.claim_batch(10)
+        self.assertEqual([n.id for n in first], due)
+        self.assertEqual(second, [])
+
+    @override_settings(EMAIL_TIMEOUT=10)
+    def test_lease_must_outlast_batch_send_time(self):
+        with self.assertRaises(CommandError):
+            call_command('send_notifications', '--batch-size=40', '--workers=4', '--lease-seconds=100')
+
+    def test_send_notifications_loop_reports_on_interrupt(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        out = StringIO()
+        with mock.patch('time.sleep', side_effect=KeyboardInterrupt):
+            call_command('send_notifications', '--loop', stdout=out)
+        self.assertIn('Batch sent: 1', out.getvalue())
+        self.assertIn('Notifications sent: 1', out.getvalue())
+
+    def test_send_notifications_command_drains_outbox(self):
+        for slot in ('18:00', '18:15', '18:30'):
+            self.client.post(reverse('app:index'), data={**self.post_data, 'visit_time': slot})
+        out = StringIO()
+        call_command('send_notifications', '--batch-size=2', stdout=out)
+        self.assertIn('Batch sent: 2', out.getvalue())
+        self.assertIn('Notifications sent: 3', out.getvalue())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(Notification.objects.filter(status='pending').exists())
+
+class SearchAvailabilityTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse('app:search_availability')
+        self.visit_date = date.today() + timedelta(days=1)
+        self.params = {'date': self.visit_date.isoformat(), 'time': '19:30', 'guests': 4}
+        self.snug = Restaurant.objects.create(name="Snug", location="10 Main Street")
+        Table.objects.create(restaurant=self.snug, size=4, quantity=1)
+        self.roomy = Restaurant.objects.create(name="Roomy", location="20 Main Street")
+        Table.objects.create(restaurant=self.roomy, size=6, quantity=2)
+        self.full = Restaurant.objects.create(name="Full House", location="30 Main Street")
+        full_table = Table.objects.create(restaurant=self.full, size=4, quantity=1)
+        Booking.objects.create(
+            guest_name="Eve", guest_email="eve@example.com", visit_date=self.visit_date,
+            visit_time=time(19, 30), number_of_guests=4, restaurant=self.full, table=full_table,
+        )
+        self.elsewhere = Restaurant.objects.create(name="Elsewhere", location="Harbour Road")
+        Table.objects.create(restaurant=self.elsewhere, size=4, quantity=3)
+
+    def test_filters_by_location_and_ranks_by_table_fit(self):
+        response = self.client.get(self.url, {**self.params, 'location': 'main street'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual([r['name'] for r in data['results']], ['Snug', 'Roomy'])
+        self.assertEqual(data['results'][1]['tables'], [
+            {'id': self.roomy.tables.get().id, 'size': 6, 'available': 2},
+        ])
+
+    def test_paginates_results(self):
+        response = self.client.get(self.url, {**self.params, 'page_size': 1, 'page': 2})
+        data = response.json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['num_pages'], 3)
+        self.assertEqual(data['page'], 2)
+        self.assertEqual(len(data['results']), 1)
+
+    def test_page_cost_does_not_grow_with_restaurants(self):
+        for i in range(20):
+            restaurant = Restaurant.objects.create(name=f"Extra {i}", location="Main Street")
+            Table.objects.create(restaurant=restaurant, size=4, quantity=2)
+        # Count, one LIMITed page of ranked restaurants, then that page's tables
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {**self.params, 'location': 'Main Street', 'page_size': 5})
+        self.assertEqual(len(queries), 3)
+        self.assertIn('LIMIT 5', queries[1]['sql'])
+        data = response.json()
+        self.assertEqual(data['count'], 22)
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(data['results'][0]['name'], 'Extra 0')
+        self.assertEqual(
+            len(find_available_restaurants(self.visit_date, time(19, 30), 4, 'Main Street')), 22
+        )
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'date': self.params['date']}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {**self.params, 'time': 'late'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {**self.params, 'guests': 0}).status_code, 400)
+
+    def test_benchmark_command_reports_single_query(self):
+        out = StringIO()
+        call_command('benchmark_availability', '--restaurants=50', '--iterations=2', stdout=out)
+        self.assertIn('3 queries', out.getvalue())
+        self.assertFalse(Restaurant.objects.filter(name__startswith='Benchmark').exists())
+
+class SlotSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.visit_date = date.today() + timedelta(days=1)
+        self.restaurant = Restaurant.objects.create(name="Snapshot Grill", location="Main Street")
+        self.small_table = Table.objects.create(restaurant=self.restaurant, size=2, quantity=1)
+        self.large_table = Table.objects.create(restaurant=self.restaurant, size=4, quantity=2)
+        self.post_data = {
+            'guest_name': 'Finn',
+            'guest_email': 'finn@example.com',
+            'visit_date': self.visit_date.isoformat(),
+            'visit_time': '19:30',
+            'number_of_guests': 3,
+            'restaurant': self.restaurant.id,
+        }
+        self.snapshot = SlotSnapshot(refresh_interval=0)
+
+    def check(self, guests=2, visit_time=time(19, 30)):
+        return self.snapshot.check(self.restaurant.id, self.visit_date, visit_time, guests)
+
+    def test_load_counts_confirmed_bookings(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        self.snapshot.load()
+        self.assertEqual(self.check(), [
+            {'id': self.small_table.id, 'size': 2, 'available': 1},
+            {'id': self.large_table.id, 'size': 4, 'available': 1},
+        ])
+
+    def test_refreshes_from_change_log(self):
+        self.snapshot.load()
+        self.client.post(reverse('app:index'), data=self.post_data)
+        self.client.post(reverse('app:index'), data=self.post_data)
+        self.assertEqual(self.check(guests=3), [])
+
+        booking = Booking.objects.first()
+        self.client.post(reverse('app:cancel_booking', args=[booking.id]))
+        self.assertEqual(self.check(guests=3), [{'id': self.large_table.id, 'size': 4, 'available': 1}])
+
+    def test_admin_status_action_is_logged(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        self.snapshot.load()
+        BookingAdmin(Booking, admin.site)._set_status(Booking.objects.all(), 'cancelled')
+        self.assertEqual(BookingChange.objects.last().delta, -1)
+        self.assertEqual(self.check(guests=3), [{'id': self.large_table.id, 'size': 4, 'available': 2}])
+
+    def test_cannot_answer_outside_window_or_slot_grid(self):
+        self.snapshot.load()
+        self.assertIsNone(self.check(visit_time=time(19, 31)))
+        self.assertIsNone(self.snapshot.check(self.restaurant.id, date.today() + timedelta(days=30), time(19, 30), 2))
+        self.assertIsNone(self.snapshot.check(0, self.visit_date, time(19, 30), 2))
+
+    def test_skips_missing_change_ids_only_after_grace(self):
+        self.snapshot.gap_grace = 3600
+        self.snapshot.load()
+        first = record_booking_change(Booking(table=self.large_table, visit_date=self.visit_date, visit_time=time(19, 30)), 1)
+        BookingChange.objects.filter(id=first.id).delete()  # simulates a transaction that has not committed yet
+        record_booking_change(Booking(table=self.large_table, visit_date=self.visit_date, visit_time=time(19, 30)), 1)
+        self.snapshot.refresh()
+        self.assertEqual(self.snapshot._low_water, first.id - 1)
+
+        self.snapshot.gap_grace = 0
+        self.snapshot.refresh()
+        self.assertEqual(self.snapshot._low_water, first.id + 1)
+        self.assertEqual(self.check(guests=3), [{'id': self.large_table.id, 'size': 4, 'available': 1}])
+
+    def test_cancellation_between_log_and_count_reads_is_not_applied_twice(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        self.client.post(reverse('app:index'), data=self.post_data)
+        booking = Booking.objects.first()
+        counters_class = slot_snapshot._Counters
+        cancelled = []
+
+        def cancel_then_count(*args):
+            # Commits after the first log read but before the counts are read
+            if not cancelled:
+                self.client.post(reverse('app:cancel_booking', args=[booking.id]))
+                cancelled.append(booking.id)
+            return counters_class(*args)
+
+        with mock.patch('app.slot_snapshot._Counters', cancel_then_count):
+            self.snapshot.load()
+        self.snapshot.refresh()
+        self.assertEqual(self.check(guests=3), [{'id': self.large_table.id, 'size': 4, 'available': 1}])
+
+    def test_change_committed_after_load_with_lower_id_is_applied(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        self.client.post(reverse('app:index'), data=self.post_data)
+        first_change = BookingChange.objects.order_by('id').first()
+        first_booking = Booking.objects.order_by('created_at').first()
+        change_id, booking_id = first_change.id, first_booking.id
+        # The first booking's transaction is still open while the snapshot loads
+        first_change.delete()
+        first_booking.delete()
+        self.snapshot.load()
+        self.assertEqual(self.check(guests=3), [{'id': self.large_table.id, 'size': 4, 'available': 1}])
+
+        first_booking.id, first_change.id = booking_id, change_id
+        first_booking.save(force_insert=True)
+        first_change.save(force_insert=True)
+        self.snapshot.refresh()
+        self.assertEqual(self.check(guests=3), [])
+
+    def test_load_builds_counters_without_holding_the_lock(self):
+        counters_class = slot_snapshot._Counters
+        lock_free = []
+
+        def build(*args):
+            lock_free.append(self.snapshot._lock.acquire(blocking=False))
+            self.snapshot._lock.release()
+            return counters_class(*args)
+
+        with mock.patch('app.slot_snapshot._Counters', build):
+            self.snapshot.load()
+        self.assertEqual(lock_free, [True])
+
+    def test_periodic_reload_runs_off_the_request_thread(self):
+        self.snapshot.load()
+        self.snapshot._loaded_at = 0.0
+        load_threads = []
+        with mock.patch.object(self.snapshot, 'load', side_effect=lambda: load_threads.append(threading.get_ident())):
+            self.assertEqual(self.check(), [
+                {'id': self.small_table.id, 'size': 2, 'available': 1},
+                {'id': self.large_table.id, 'size': 4, 'available': 2},
+            ])
+            self.snapshot._reload_thread.join()
+        self.assertEqual(len(load_threads), 1)
+        self.assertNotEqual(load_threads[0], threading.get_ident())
+
+    def test_load_prunes_change_log_past_retention(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        self.client.post(reverse('app:index'), data=self.post_data)
+        old, recent = BookingChange.objects.order_by('id')
+        BookingChange.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(hours=2))
+        self.snapshot.load()
+        self.assertEqual(list(BookingChange.objects.values_list('id', flat=True)), [recent.id])
+        self.assertEqual(self.check(guests=3), [])
+
+    def test_snapshot_idle_past_retention_reloads_synchronously(self):
+        self.snapshot.load()
+        self.client.post(reverse('app:index'), data=self.post_data)
+        BookingChange.objects.update(created_at=timezone.now() - timedelta(hours=2))
+        self.snapshot.prune_log()  # another worker pruned the change this one never read
+        self.snapshot._refreshed_at -= self.snapshot.log_retention
+        self.assertEqual(self.check(guests=3), [{'id': self.large_table.id, 'size': 4, 'available': 1}])
+
+    @override_settings(AVAILABILITY_SNAPSHOT=True)
+    def test_check_availability_uses_snapshot(self):
+        self.client.post(reverse('app:index'), data=self.post_data)
+        self.snapshot.refresh_interval = 3600
+        self.snapshot.load()
+        previous, slot_snapshot._snapshot = slot_snapshot._snapshot, self.snapshot
+        try:
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse('app:check_availability'), {
+                    'restaurant_id': self.restaurant.id, 'date': self.visit_date.isoformat(),
+                    'time': '19:30', 'guests': 3,
+                })
+        finally:
+            slot_snapshot._snapshot = previous
+        self.assertEqual(response.json(), {
+            'available': True,
+            'tables': [{'id': self.large_table.id, 'size': 4, 'available': 1}],
+        })
+
+class StartupProfileTestCase(TestCase):
+    def test_booking_form_min_date_is_set_per_instance(self):
+        self.assertNotIn('min', BookingForm.base_fields['visit_date'].widget.attrs)
+        form = BookingForm()
+        self.assertEqual(form.fields['visit_date'].widget.attrs['min'], date.today().isoformat())
+
+    @override_settings(ROOT_URLCONF='main.urls_slim')
+    def test_slim_urlconf_serves_only_the_api(self):
+        self.assertEqual(reverse('app:search_availability'), '/api/search-availability/')
+        with self.assertRaises(NoReverseMatch):
+            reverse('app:index')
+
+    def test_profile_startup_command(self):
+        out = StringIO()
+        call_command('profile_startup', '--settings-module=main.settings_slim', '--runs=1', '--top=3', stdout=out)
+        report = out.getvalue()
+        self.assertIn('main.settings_slim: median start', report)
+        self.assertIn('django.db', report)
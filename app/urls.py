@@ -1,7 +1,8 @@
 from django.urls import path
 from .views import (
     index, booking_detail, cancel_booking, 
-    restaurant_list, restaurant_detail, check_availability
+    restaurant_list, restaurant_detail, check_availability,
+    search_availability
 )
 
 app_name = 'app'
@@ -12,5 +13,12 @@ urlpatterns = [
     path('booking/<uuid:booking_id>/cancel/', cancel_booking, name='cancel_booking'),
     path('restaurants/', restaurant_list, name='restaurant_list'),
     path('restaurants/<int:restaurant_id>/', restaurant_detail, name='restaurant_detail'),
+]
+
+# JSON endpoints, also served on their own by the slim settings profile
+api_urlpatterns = [
     path('api/check-availability/', check_availability, name='check_availability'),
+    path('api/search-availability/', search_availability, name='search_availability'),
 ]
+
+urlpatterns += api_urlpatterns
@@ -5,75 +5,12 @@ from django.utils import timezone
 from django.core.paginator import Paginator
 from django.http import JsonResponse
 from .models import Restaurant, Table, Booking
-from django import forms
+from .forms import BookingForm
+from .notifications import enqueue_notification
+from .availability import find_available_restaurants, with_tables
+from .slot_snapshot import get_slot_snapshot, record_booking_change
 import datetime
 
-class BookingForm(forms.Form):
-    guest_name = forms.CharField(
-        max_length=100, 
-        label="Guest name",
-        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter your full name'})
-    )
-    guest_email = forms.EmailField(
-        label="Guest email",
-        widget=forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'Enter your email address'})
-    )
-    guest_phone = forms.CharField(
-        max_length=20, 
-        required=False,
-        label="Phone number (optional)",
-        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter your phone number'})
-    )
-    visit_date = forms.DateField(
-        widget=forms.DateInput(attrs={
-            'type': 'date', 
-            'min': datetime.date.today().isoformat(),
-            'class': 'form-control'
-        }),
-        label="Visit date"
-    )
-    visit_time = forms.TimeField(
-        widget=forms.TimeInput(attrs={
-            'type': 'time', 
-            'step': '900',
-            'class': 'form-control'
-        }),
-        label="Visit time"
-    )
-    number_of_guests = forms.IntegerField(
-        min_value=1, 
-        max_value=20,
-        label="Number of guests",
-        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'How many people?'})
-    )
-    restaurant = forms.ModelChoiceField(
-        queryset=Restaurant.objects.filter(is_active=True),
-        empty_label="-- Choose a Restaurant --",
-        label="Restaurant",
-        widget=forms.Select(attrs={'class': 'form-control'})
-    )
-    special_requests = forms.CharField(
-        required=False,
-        label="Special requests (optional)",
-        widget=forms.Textarea(attrs={
-            'class': 'form-control', 
-            'rows': 3, 
-            'placeholder': 'Any special dietary requirements or requests?'
-        })
-    )
-
-    def clean_visit_date(self):
-        date = self.cleaned_data.get('visit_date')
-        if date and date < datetime.date.today():
-            raise forms.ValidationError("Cannot book for past dates.")
-        return date
-
-    def clean_number_of_guests(self):
-        guests = self.cleaned_data.get('number_of_guests')
-        if guests and guests > 20:
-            raise forms.ValidationError("Maximum 20 guests per booking.")
-        return guests
-
 def index(request):
     """Main booking page"""
     if request.method == 'POST':
@@ -118,6 +55,8 @@ def index(request):
                                 table=table,
                                 special_requests=data.get('special_requests', '')
                             )
+                            record_booking_change(booking, 1)
+                            enqueue_notification(booking, 'confirmation')
                             messages.success(request, f"Booking confirmed! Your booking ID is {booking.id}")
                             return render(request, 'success.html', {
                                 'booking': booking,
@@ -147,13 +86,22 @@ def cancel_booking(request, booking_id):
     
     if not booking.can_be_cancelled():
         messages.error(request, "This booking cannot be cancelled.")
-        return redirect('booking_detail', booking_id=booking_id)
+        return redirect('app:booking_detail', booking_id=booking_id)
     
     if request.method == 'POST':
-        booking.status = 'cancelled'
-        booking.save()
-        messages.success(request, "Booking cancelled successfully.")
-        return redirect('index')
+        with transaction.atomic():
+            # Conditional update so a double-submitted cancel only logs and emails once
+            cancelled = Booking.objects.filter(pk=booking.pk, status='confirmed').update(
+                status='cancelled', updated_at=timezone.now()
+            )
+            if cancelled:
+                record_booking_change(booking, -1)
+                enqueue_notification(booking, 'cancellation')
+        if cancelled:
+            messages.success(request, "Booking cancelled successfully.")
+        else:
+            messages.info(request, "This booking has already been cancelled.")
+        return redirect('app:index')
     
     return render(request, 'cancel_booking.html', {'booking': booking})
 
@@ -188,6 +136,21 @@ def check_availability(request):
             return JsonResponse({'error': 'Missing parameters'}, status=400)
         
         try:
+            snapshot = get_slot_snapshot()
+            if snapshot is not None:
+                available_tables = snapshot.check(
+                    int(restaurant_id),
+                    datetime.date.fromisoformat(date),
+                    datetime.time.fromisoformat(time),
+                    int(guests)
+                )
+                # None means the snapshot can't answer (unknown restaurant, odd slot, far date)
+                if available_tables is not None:
+                    return JsonResponse({
+                        'available': len(available_tables) > 0,
+                        'tables': available_tables
+                    })
+            
             restaurant = Restaurant.objects.get(id=restaurant_id, is_active=True)
             tables = Table.objects.filter(
                 restaurant=restaurant,
@@ -220,3 +183,38 @@ def check_availability(request):
             return JsonResponse({'error': 'Invalid parameters'}, status=400)
     
     return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+def search_availability(request):
+    """AJAX endpoint to find restaurants with a free table, optionally near a location"""
+    if request.method == 'GET':
+        date = request.GET.get('date')
+        time = request.GET.get('time')
+        guests = request.GET.get('guests')
+        location = request.GET.get('location', '').strip()
+        
+        if not all([date, time, guests]):
+            return JsonResponse({'error': 'Missing parameters'}, status=400)
+        
+        try:
+            visit_date = datetime.date.fromisoformat(date)
+            visit_time = datetime.time.fromisoformat(time)
+            guests = int(guests)
+            page_size = min(int(request.GET.get('page_size', 10)), 50)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid parameters'}, status=400)
+        
+        if guests < 1 or page_size < 1:
+            return JsonResponse({'error': 'Invalid parameters'}, status=400)
+        
+        restaurants = find_available_restaurants(visit_date, visit_time, guests, location)
+        paginator = Paginator(restaurants, page_size)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        
+        return JsonResponse({
+            'count': paginator.count,
+            'page': page_obj.number,
+            'num_pages': paginator.num_pages,
+            'results': with_tables(page_obj, visit_date, visit_time, guests),
+        })
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -73,3 +74,19 @@ STATICFILES_DIRS = [
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Booking emails are queued in the Notification outbox and sent by `manage.py send_notifications`.
+# The file backend keeps local runs off SMTP; set EMAIL_BACKEND to the SMTP backend in production.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.filebased.EmailBackend')
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+DEFAULT_FROM_EMAIL = 'TableBook <bookings@tablebook.local>'
+# Seconds before a hung SMTP connection gives up; keeps sends inside the worker's lease
+EMAIL_TIMEOUT = 10
+
+# Optional per-worker in-memory snapshot used by the check-availability API.
+# Bookings are still written and validated against the database.
+AVAILABILITY_SNAPSHOT = os.environ.get('AVAILABILITY_SNAPSHOT') == '1'
+AVAILABILITY_SNAPSHOT_DAYS = 14
+AVAILABILITY_SNAPSHOT_REFRESH_SECONDS = 1.0
+# BookingChange rows older than this are deleted on each snapshot load
+AVAILABILITY_SNAPSHOT_LOG_RETENTION_SECONDS = 3600
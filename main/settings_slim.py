@@ -0,0 +1,32 @@
+"""Lean profile for API-only workers and cron-run management commands.
+
+Drops admin, auth, sessions, messages and static files so they are never
+imported. Serves only the JSON endpoints; run migrations with main.settings.
+
+    DJANGO_SETTINGS_MODULE=main.settings_slim python manage.py load_restaurants
+"""
+from .settings import *
+
+INSTALLED_APPS = [
+    'app',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'main.urls_slim'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [BASE_DIR / 'templates'],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [],
+        },
+    },
+]
+
+AUTH_PASSWORD_VALIDATORS = []
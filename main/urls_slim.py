@@ -0,0 +1,6 @@
+from django.urls import path, include
+from app.urls import api_urlpatterns
+
+urlpatterns = [
+    path('', include((api_urlpatterns, 'app'))),
+]